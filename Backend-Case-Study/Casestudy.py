@@ -19,6 +19,34 @@ All non-executable text is written as comments for clarity.
 # multiple warehouses and manage supplier relationships.
 
 
+# ============================================================
+# APPLICATION SETUP
+# ============================================================
+
+import os
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+app = Flask(__name__)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+app.config['REDIS_URL'] = os.environ['REDIS_URL']
+
+# Connection pool sized for concurrent API traffic; pre-ping and
+# recycle drop stale connections before they cause request errors.
+# Must be set before SQLAlchemy(app), which reads it at init time.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_size": 20,
+    "max_overflow": 40,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800
+}
+
+db = SQLAlchemy(app)
+
+# Models (Product, Inventory, Warehouse, Supplier, ...) are assumed
+# to be defined on db as in the schema in Part 2
+
+
 # ============================================================
 # PART 1: CODE REVIEW & DEBUGGING
 # ============================================================
@@ -75,10 +103,47 @@ def create_product():
 # Corrected Version with Fixes
 # ------------------------------------------------------------
 
-from decimal import Decimal
+from pydantic import BaseModel, ValidationError, condecimal, conint, constr
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 from flask import request
 
+
+# Upper bound of a PostgreSQL INT column
+MAX_INT = 2**31 - 1
+
+
+class ProductIn(BaseModel):
+    """
+    Request body for product creation.
+    Validates required fields and coerces price to Decimal.
+    Limits match the column sizes in the Part 2 schema.
+    """
+    name: constr(max_length=255)
+    sku: constr(max_length=50)
+    price: condecimal(max_digits=10, decimal_places=2)
+    warehouse_id: conint(gt=0, le=MAX_INT)
+    initial_quantity: conint(ge=0, le=MAX_INT) = 0
+
+
+# The product belongs to the company that owns the target warehouse;
+# no row is returned if the warehouse does not exist
+CREATE_PRODUCT_SQL = text("""
+    WITH p AS (
+        INSERT INTO products (company_id, sku, product_name, price)
+        SELECT w.company_id, :sku, :name, :price
+        FROM warehouses w
+        WHERE w.warehouse_id = :warehouse_id
+        RETURNING product_id, company_id
+    ),
+    i AS (
+        INSERT INTO inventory (product_id, warehouse_id, quantity)
+        SELECT product_id, :warehouse_id, :quantity FROM p
+    )
+    SELECT product_id, company_id FROM p
+""")
+
+
 @app.route('/api/products', methods=['POST'])
 def create_product():
     """
@@ -88,49 +153,47 @@ def create_product():
 
     data = request.json or {}
 
-    # 1. Input validation
-    required_fields = ['name', 'sku', 'price', 'warehouse_id']
-    for field in required_fields:
-        if field not in data:
-            return {"error": f"{field} is required"}, 400
-
-    # 2. SKU uniqueness check
-    if Product.query.filter_by(sku=data['sku']).first():
-        return {"error": "SKU must be unique"}, 409
-
-    # 3. Safe decimal price handling
+    # 1. Input validation (required fields, price format,
+    #    non-negative quantity) in a single pass
     try:
-        price = Decimal(str(data['price']))
-    except:
-        return {"error": "Invalid price format"}, 400
-
-    # 4. Optional quantity validation
-    quantity = data.get('initial_quantity', 0)
-    if quantity < 0:
-        return {"error": "Initial quantity cannot be negative"}, 400
+        payload = ProductIn.model_validate(data)
+    except ValidationError as e:
+        first = e.errors()[0]
+        field = ".".join(str(part) for part in first['loc'])
+        message = f"{field}: {first['msg']}" if field else first['msg']
+        return {"error": message}, 400
 
     try:
-        # 5. Single transaction for consistency
+        # 2. Single transaction for consistency.
+        #    SKU uniqueness is enforced by UNIQUE (company_id, sku);
+        #    company_id is always set from the warehouse, so the
+        #    constraint applies and is race-free unlike a SELECT
+        #    before INSERT.
+        #    Product and inventory rows are inserted in one statement
+        #    (writable CTE), so creation takes a single round-trip.
         with db.session.begin():
-            product = Product(
-                name=data['name'],
-                sku=data['sku'],
-                price=price
-            )
-            db.session.add(product)
-            db.session.flush()  # get product.id
-
-            inventory = Inventory(
-                product_id=product.id,
-                warehouse_id=data['warehouse_id'],
-                quantity=quantity
-            )
-            db.session.add(inventory)
-
-        return {"message": "Product created", "product_id": product.id}, 201
-
-    except IntegrityError:
+            created = db.session.execute(CREATE_PRODUCT_SQL, {
+                "name": payload.name,
+                "sku": payload.sku,
+                "price": payload.price,
+                "warehouse_id": payload.warehouse_id,
+                "quantity": payload.initial_quantity
+            }).one_or_none()
+
+        if created is None:
+            return {"error": "warehouse_id does not exist"}, 400
+
+        # 3. New inventory invalidates cached low-stock alerts
+        bump_low_stock_tick(created.company_id)
+
+        return {"message": "Product created", "product_id": created.product_id}, 201
+
+    except IntegrityError as e:
         db.session.rollback()
+        # psycopg2 exposes the SQLSTATE as pgcode, psycopg 3 as sqlstate
+        sqlstate = getattr(e.orig, 'pgcode', None) or getattr(e.orig, 'sqlstate', None)
+        if sqlstate == '23505':  # unique_violation
+            return {"error": "SKU must be unique"}, 409
         return {"error": "Database error while creating product"}, 500
 
 
@@ -156,10 +219,11 @@ CREATE TABLE warehouses (
 
 CREATE TABLE products (
     product_id SERIAL PRIMARY KEY,
-    company_id INT REFERENCES companies(company_id),
+    company_id INT NOT NULL REFERENCES companies(company_id),
     sku VARCHAR(50),
     product_name VARCHAR(255),
     price DECIMAL(10,2),
+    low_stock_threshold INT DEFAULT 0,
     is_bundle BOOLEAN DEFAULT FALSE,
     UNIQUE (company_id, sku)
 );
@@ -172,13 +236,51 @@ CREATE TABLE inventory (
 );
 
 CREATE TABLE inventory_logs (
-    log_id SERIAL PRIMARY KEY,
+    log_id SERIAL,
     product_id INT,
     warehouse_id INT,
     change_amount INT,
     reason VARCHAR(50),
-    created_at TIMESTAMP
-);
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (log_id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE sales (
+    sale_id SERIAL,
+    product_id INT REFERENCES products(product_id),
+    warehouse_id INT REFERENCES warehouses(warehouse_id),
+    quantity INT,
+    date DATE NOT NULL,
+    PRIMARY KEY (sale_id, date)
+) PARTITION BY RANGE (date);
+
+-- One partition per month. Historical months are created before
+-- backfilling data, and a monthly job runs the same loop to add the
+-- next month's partition before it starts.
+DO $$
+DECLARE
+    m DATE;
+BEGIN
+    FOR m IN
+        SELECT generate_series(DATE '2025-01-01', DATE '2026-11-01', interval '1 month')
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS sales_%s PARTITION OF sales
+                 FOR VALUES FROM (%L) TO (%L)',
+            to_char(m, 'YYYY_MM'), m, m + interval '1 month');
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS inventory_logs_%s PARTITION OF inventory_logs
+                 FOR VALUES FROM (%L) TO (%L)',
+            to_char(m, 'YYYY_MM'), m, m + interval '1 month');
+    END LOOP;
+END $$;
+
+-- Safety net only: these must stay empty. Rows here cannot be pruned
+-- from the 30-day window scan and block creating the matching monthly
+-- partition, so a non-empty default partition is alerted on and its
+-- rows moved into a proper monthly partition.
+CREATE TABLE sales_default PARTITION OF sales DEFAULT;
+CREATE TABLE inventory_logs_default PARTITION OF inventory_logs DEFAULT;
 
 CREATE TABLE bundle_items (
     parent_id INT REFERENCES products(product_id),
@@ -196,16 +298,71 @@ CREATE TABLE suppliers (
 CREATE TABLE supplier_products (
     supplier_id INT REFERENCES suppliers(supplier_id),
     product_id INT REFERENCES products(product_id),
+    is_primary BOOLEAN NOT NULL DEFAULT FALSE,
     PRIMARY KEY (supplier_id, product_id)
 );
+
+-- Indexes for the low-stock alert query
+CREATE INDEX idx_products_company ON products(company_id) INCLUDE (low_stock_threshold);
+CREATE INDEX idx_inventory_warehouse_qty ON inventory(warehouse_id, quantity);
+CREATE INDEX idx_sales_pwd ON sales(product_id, warehouse_id, date DESC);
+CREATE INDEX idx_supplier_products_pid ON supplier_products(product_id);
+
+-- BRIN indexes suit append-only, time-ordered log tables
+CREATE INDEX idx_sales_date_brin ON sales
+    USING BRIN (date) WITH (pages_per_range = 32);
+CREATE INDEX idx_inventory_logs_created_brin ON inventory_logs
+    USING BRIN (created_at) WITH (pages_per_range = 32);
+
+-- Precomputed low-stock candidates: products with sales in the last
+-- 30 days, one row per product and warehouse, with their sales velocity
+-- and primary supplier. Stock level and threshold are not stored here;
+-- the endpoint checks them against live inventory.
+CREATE MATERIALIZED VIEW mv_low_stock_candidates AS
+SELECT
+    p.company_id,
+    p.product_id,
+    i.warehouse_id,
+    s.last_d AS last_sale_date,
+    -- Average over the whole 30-day window; numeric avoids integer division
+    s.qty::numeric / 30 AS daily_velocity,
+    ps.supplier_id AS primary_supplier_id
+FROM products p
+JOIN inventory i USING (product_id)
+JOIN (
+    SELECT product_id, warehouse_id,
+           MAX(date) AS last_d, SUM(quantity) AS qty
+    FROM sales
+    WHERE date >= now() - interval '30 day'
+    GROUP BY 1, 2
+) s USING (product_id, warehouse_id)
+LEFT JOIN (
+    SELECT DISTINCT ON (product_id) product_id, supplier_id
+    FROM supplier_products
+    ORDER BY product_id, is_primary DESC, supplier_id
+) ps USING (product_id);
+
+-- Unique index is required for REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_mv_low_stock_company
+    ON mv_low_stock_candidates(company_id, product_id, warehouse_id);
+
+-- Refreshed on a schedule by the `flask refresh-low-stock` command
+-- (see Part 3) to move the 30-day window forward
 """
 
 # Design Notes:
 # - Companies own warehouses, products, and suppliers
 # - Inventory enables multi-warehouse stock tracking
 # - Inventory logs provide audit history
+# - Sales and inventory logs are partitioned by month, so the
+#   30-day sales window only scans the latest partitions
 # - Bundles are self-referencing products
 # - Suppliers provide multiple products
+# - is_primary marks the preferred supplier used for reorder alerts
+# - Composite indexes cover the company, stock-level and recent-sales
+#   filters used by the low-stock alerts endpoint
+# - mv_low_stock_candidates precomputes the recent-sales aggregation
+#   and primary supplier, so the alerts endpoint does not scan sales
 
 
 # ============================================================
@@ -220,11 +377,95 @@ CREATE TABLE supplier_products (
 
 # Assumptions:
 # - Each product has a low_stock_threshold field
-# - Sales table exists with product_id, warehouse_id, and date
+# - Sales table has product_id, warehouse_id, quantity, and date
 # - A product can have one or more suppliers (primary supplier returned)
 # - Authentication is handled outside this endpoint
+# - LowStockCandidate is a read-only model mapped to mv_low_stock_candidates
 
-from datetime import datetime, timedelta
+import time
+
+import orjson
+import redis
+from flask import Response, stream_with_context
+from sqlalchemy import Integer, and_, case, cast, func, lambda_stmt, select
+
+# Cached alert responses live for 60 seconds, which bounds staleness
+# for changes that do not bump the tick (e.g. view refreshes). Each
+# company has a tick counter that is bumped on inventory / sales
+# writes; the tick is part of the cache key and ETag, so a bump makes
+# old entries unreachable. Redis is only a first-line cache: if it is
+# unavailable, requests fall through to the database.
+redis_client = redis.Redis.from_url(app.config['REDIS_URL'])
+LOW_STOCK_CACHE_TTL = 60
+
+# Responses larger than this are streamed but not cached, so a miss
+# never buffers an unbounded body in memory
+LOW_STOCK_CACHE_MAX_BYTES = 1024 * 1024
+
+
+def _low_stock_tick_key(company_id):
+    return f"low_stock_tick:{company_id}"
+
+
+def _init_low_stock_tick(pipe, company_id):
+    # A missing tick starts from the current time rather than 0, so
+    # losing the key in Redis never brings back an old tick value
+    pipe.set(_low_stock_tick_key(company_id), time.time_ns(), nx=True)
+
+
+def get_low_stock_tick(company_id):
+    """
+    Returns the current cache tick for a company.
+    Raises redis.RedisError if Redis is unavailable.
+    """
+    pipe = redis_client.pipeline()
+    _init_low_stock_tick(pipe, company_id)
+    pipe.get(_low_stock_tick_key(company_id))
+    return int(pipe.execute()[-1])
+
+
+def bump_low_stock_tick(company_id):
+    """
+    Invalidates cached low-stock alerts for a company.
+    Call after any inventory or sales change. Redis errors are
+    logged and ignored; cached entries then expire via their TTL.
+    """
+    try:
+        pipe = redis_client.pipeline()
+        _init_low_stock_tick(pipe, company_id)
+        pipe.incr(_low_stock_tick_key(company_id))
+        pipe.execute()
+    except redis.RedisError:
+        app.logger.warning("Could not bump low-stock tick for company %s", company_id)
+
+
+@app.cli.command('refresh-low-stock')
+def refresh_low_stock_candidates():
+    """
+    Refreshes mv_low_stock_candidates without blocking readers.
+    Run from a scheduler (e.g. cron every 15 minutes); sales newer
+    than the last refresh are picked up on the next run.
+    """
+    with db.session.begin():
+        db.session.execute(
+            text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_low_stock_candidates")
+        )
+
+
+# Estimate days until stockout
+# If sales velocity is zero, use a safe fallback value
+DAYS_UNTIL_STOCKOUT = case(
+    (
+        LowStockCandidate.daily_velocity > 0,
+        # floor() keeps the truncating behaviour of int();
+        # a plain CAST to INTEGER would round instead
+        cast(
+            func.floor(Inventory.quantity / LowStockCandidate.daily_velocity),
+            Integer
+        )
+    ),
+    else_=99
+)
 
 @app.route('/api/companies/<int:company_id>/alerts/low-stock', methods=['GET'])
 def get_low_stock(company_id):
@@ -235,70 +476,127 @@ def get_low_stock(company_id):
     - Have recent sales activity
     """
 
-    # Define recent sales window (last 30 days)
-    last_month = datetime.now() - timedelta(days=30)
-
-    # Fetch products with inventory below threshold
-    query = db.session.query(
-        Product,
-        Inventory,
-        Warehouse,
-        Supplier
-    ).join(
-        Inventory, Product.id == Inventory.product_id
+    # Serve from cache when nothing has changed since the last response.
+    # A 304 is only returned while the cache entry exists, so clients
+    # are never kept on a response older than the cache TTL.
+    try:
+        tick = get_low_stock_tick(company_id)
+        cache_key = f"lowstock:{company_id}:{tick}"
+        etag = f"{company_id}-{tick}"
+        cached = redis_client.get(cache_key)
+    except redis.RedisError:
+        app.logger.warning("Redis unavailable, serving low-stock alerts from the database")
+        cache_key = etag = cached = None
+
+    if cached is not None:
+        if etag in request.if_none_match:
+            return Response(status=304)
+        response = Response(cached, status=200, mimetype='application/json')
+        response.set_etag(etag)
+        return response
+
+    # Products with recent sales are precomputed in
+    # mv_low_stock_candidates; stock level and threshold are read
+    # from the live inventory and products tables.
+    # lambda_stmt caches the compiled SQL after the first call;
+    # company_id is passed as a bound parameter on every request.
+    # Only the columns needed for the response are selected, so rows
+    # come back as plain tuples and no lazy loads are triggered.
+    # LEFT JOIN keeps products that have no supplier.
+    stmt = lambda_stmt(lambda: select(
+        LowStockCandidate.product_id,
+        Product.product_name,
+        Product.sku,
+        Product.low_stock_threshold,
+        Inventory.quantity,
+        LowStockCandidate.warehouse_id,
+        Warehouse.location_name,
+        Supplier.supplier_id,
+        Supplier.supplier_name,
+        Supplier.contact_email,
+        DAYS_UNTIL_STOCKOUT.label('days_left')
     ).join(
-        Warehouse, Inventory.warehouse_id == Warehouse.id
+        Inventory, and_(
+            Inventory.product_id == LowStockCandidate.product_id,
+            Inventory.warehouse_id == LowStockCandidate.warehouse_id
+        )
     ).join(
-        SupplierProduct, SupplierProduct.product_id == Product.id
+        Product, Product.id == LowStockCandidate.product_id
     ).join(
-        Supplier, Supplier.id == SupplierProduct.supplier_id
-    ).filter(
-        Product.company_id == company_id,
+        Warehouse, Warehouse.id == LowStockCandidate.warehouse_id
+    ).outerjoin(
+        Supplier, Supplier.id == LowStockCandidate.primary_supplier_id
+    ).where(
+        LowStockCandidate.company_id == company_id,
         Inventory.quantity <= Product.low_stock_threshold
-    )
-
-    alerts = []
-
-    for product, inventory, warehouse, supplier in query.all():
-
-        # Check for recent sales activity
-        has_sales = Sale.query.filter(
-            Sale.product_id == product.id,
-            Sale.warehouse_id == warehouse.id,
-            Sale.date >= last_month
-        ).first()
-
-        # Skip products with no recent sales
-        if not has_sales:
-            continue
-
-        # Calculate average daily sales (helper function assumed)
-        daily_velocity = get_daily_sales_rate(product.id, warehouse.id)
-
-        # Estimate days until stockout
-        # If sales velocity is zero, use a safe fallback value
-        days_left = int(inventory.quantity / daily_velocity) if daily_velocity > 0 else 99
-
-        alerts.append({
-            "product_id": product.id,
-            "product_name": product.product_name,
-            "sku": product.sku,
-            "warehouse_id": warehouse.warehouse_id,
-            "warehouse_name": warehouse.location_name,
-            "current_stock": inventory.quantity,
-            "threshold": product.low_stock_threshold,
-            "days_until_stockout": days_left,
-            "supplier": {
-                "id": supplier.supplier_id,
-                "name": supplier.supplier_name,
-                "contact_email": supplier.contact_email
+    ))
+
+    def generate():
+        # Alerts are written to the response one row at a time,
+        # so the full alert list is never built as Python objects.
+        # Encoded chunks are kept to populate the cache at the end,
+        # up to LOW_STOCK_CACHE_MAX_BYTES; past that they are dropped
+        # and the response is only streamed.
+        chunks = [] if cache_key is not None else None
+        cached_size = 0
+
+        def emit(chunk):
+            nonlocal chunks, cached_size
+            if chunks is not None:
+                cached_size += len(chunk)
+                if cached_size > LOW_STOCK_CACHE_MAX_BYTES:
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+            return chunk
+
+        yield emit(b'{"alerts":[')
+
+        total_alerts = 0
+        # Server-side cursor fetches rows in batches of 500
+        rows = db.session.execute(
+            stmt,
+            execution_options={"stream_results": True, "yield_per": 500}
+        )
+        for row in rows:
+            alert = {
+                "product_id": row.product_id,
+                "product_name": row.product_name,
+                "sku": row.sku,
+                "warehouse_id": row.warehouse_id,
+                "warehouse_name": row.location_name,
+                "current_stock": row.quantity,
+                "threshold": row.low_stock_threshold,
+                "days_until_stockout": row.days_left,
+                "supplier": {
+                    "id": row.supplier_id,
+                    "name": row.supplier_name,
+                    "contact_email": row.contact_email
+                } if row.supplier_id is not None else None
             }
-        })
 
-    return {
-        "alerts": alerts,
-        "total_alerts": len(alerts)
-    }, 200
+            if total_alerts:
+                yield emit(b',')
+            yield emit(orjson.dumps(alert))
+            total_alerts += 1
+
+        # Total is known only after streaming, so it goes last
+        yield emit(b'],"total_alerts":%d}' % total_alerts)
+
+        if chunks is not None:
+            try:
+                redis_client.setex(cache_key, LOW_STOCK_CACHE_TTL, b''.join(chunks))
+            except redis.RedisError:
+                app.logger.warning("Could not cache low-stock alerts for company %s", company_id)
+
+    response = Response(
+        stream_with_context(generate()),
+        status=200,
+        mimetype='application/json'
+    )
+    if etag is not None:
+        response.set_etag(etag)
+    return response
 
 
 # ------------------------------------------------------------
@@ -310,6 +608,11 @@ def get_low_stock(company_id):
 # 3. Products in multiple warehouses are evaluated independently
 # 4. Missing supplier information does not break the response
 # 5. If no products are low on stock, an empty alerts list is returned
+# 6. Large alert lists are streamed instead of built in memory;
+#    only responses up to 1 MB are buffered for the cache
+# 7. Repeated polling is served from Redis for up to 60 seconds, or
+#    until stock or sales change
+# 8. If Redis is unavailable, alerts are served from the database
 
 
 # ------------------------------------------------------------
@@ -317,7 +620,13 @@ def get_low_stock(company_id):
 # ------------------------------------------------------------
 
 # - Inventory is filtered using product-specific low stock thresholds
+# - Recent-sales candidates are precomputed in a materialized view;
+#   stock levels are always read live
 # - Recent sales activity ensures alerts are business-relevant
 # - Alerts are generated at warehouse level for operational accuracy
 # - Days until stockout is estimated using average daily sales
-# - Supplier details are included to support immediate reordering
\ No newline at end of file
+# - Daily sales velocity is computed once per product and warehouse
+#   in SQL, so no per-alert sales lookups are made
+# - Supplier details are included to support immediate reordering
+# - Responses are cached in Redis per company and invalidated by a
+#   tick counter, with ETags so polling clients can get a 304
\ No newline at end of file